@@ -2,18 +2,47 @@
 Flask application factory
 """
 import os
-from flask import Flask
+import sqlite3
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
 from flask_migrate import Migrate
+from flask_caching import Cache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 from config import config
+from app.json_provider import OrjsonProvider
 
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
+cache = Cache()
+
+
+def cache_timeout(timeout):
+    """``timeout`` with a shared cache backend, capped at CACHE_LOCAL_TIMEOUT otherwise"""
+    if current_app.config['CACHE_SHARED']:
+        return timeout
+    return min(timeout, current_app.config['CACHE_LOCAL_TIMEOUT'])
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """Enforce foreign keys on SQLite, as MySQL does"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def _use_utc_session_time_zone(dbapi_connection, connection_record):
+    """Make MySQL's NOW()/CURRENT_TIMESTAMP UTC, like the rest of our timestamps"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET time_zone = '+00:00'")
+    cursor.close()
 
 
 def create_app(config_name=None):
@@ -23,11 +52,16 @@ def create_app(config_name=None):
 
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = OrjsonProvider(app)
 
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'mysql':
+            event.listen(db.engine, 'connect', _use_utc_session_time_zone)
     login_manager.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
 
     # Configure CORS
     CORS(app,
@@ -44,6 +78,10 @@ def create_app(config_name=None):
         from flask import jsonify
         return jsonify({'error': 'Authentication required'}), 401
 
+    # Fail loudly on lazy loads that should have been eager-loaded
+    if app.config.get('SQLALCHEMY_RAISELOAD'):
+        _enable_raiseload()
+
     # Register blueprints
     from app.api import auth, books, library
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
@@ -56,3 +94,24 @@ def create_app(config_name=None):
         return {'status': 'ok'}
 
     return app
+
+
+def _raiseload_on_execute(orm_execute_state):
+    """Append raiseload('*') to SELECTs against the library models"""
+    from sqlalchemy.orm import raiseload
+    from app.models import UserLibrary, Favorite, ReadingProgress
+
+    if (not orm_execute_state.is_select
+            or orm_execute_state.is_column_load
+            or orm_execute_state.is_relationship_load):
+        return
+
+    guarded = {UserLibrary.__mapper__, Favorite.__mapper__, ReadingProgress.__mapper__}
+    if guarded.intersection(orm_execute_state.all_mappers):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*'))
+
+
+def _enable_raiseload():
+    """Register the raiseload hook on the session (once per process)"""
+    if not event.contains(db.session, 'do_orm_execute', _raiseload_on_execute):
+        event.listen(db.session, 'do_orm_execute', _raiseload_on_execute)
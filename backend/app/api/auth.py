@@ -1,12 +1,16 @@
 """
 Authentication API routes
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
+from flask_login.config import COOKIE_NAME as REMEMBER_COOKIE_NAME
 from email_validator import validate_email, EmailNotValidError
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
 
-from app import db
+from app import db, cache
 from app.models import User
+from app.models.user import profile_cache_key
 
 bp = Blueprint('auth', __name__)
 
@@ -34,8 +38,8 @@ def signup():
     if len(password) < 8:
         return jsonify({'error': 'Password must be at least 8 characters'}), 400
 
-    # Check if email already exists
-    if User.query.filter_by(email=email).first():
+    # Check if email already exists (id only; no need to hydrate a User)
+    if db.session.scalar(select(User.id).where(User.email == email)) is not None:
         return jsonify({'error': 'Email already registered'}), 409
 
     # Create user
@@ -74,7 +78,12 @@ def login():
         return jsonify({'error': 'Email and password required'}), 400
 
     # Find user
-    user = User.query.filter_by(email=email).first()
+    user = (
+        User.query
+        .options(undefer(User.password_hash))
+        .filter_by(email=email)
+        .first()
+    )
 
     if not user or not user.check_password(password):
         return jsonify({'error': 'Invalid email or password'}), 401
@@ -102,15 +111,30 @@ def logout():
 @bp.route('/me', methods=['GET'])
 def get_current_user():
     """Get current logged-in user info"""
-    if current_user.is_authenticated:
-        return jsonify({
+    response = jsonify(_current_user_payload())
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+
+def _has_auth_cookie():
+    """Whether the request carries a session or remember-me cookie"""
+    config = current_app.config
+    return (config['SESSION_COOKIE_NAME'] in request.cookies
+            or config.get('REMEMBER_COOKIE_NAME', REMEMBER_COOKIE_NAME) in request.cookies)
+
+
+def _current_user_payload():
+    # Without a cookie there is nobody to load; skip Flask-Login entirely
+    if _has_auth_cookie() and current_user.is_authenticated:
+        return {
             'authenticated': True,
             'user': current_user.to_dict()
-        })
-    return jsonify({
+        }
+    return {
         'authenticated': False,
         'user': None
-    })
+    }
 
 
 @bp.route('/me', methods=['PATCH'])
@@ -126,13 +150,13 @@ def update_current_user():
     if 'displayName' in data:
         current_user.display_name = data['displayName'].strip() or None
 
-    # Update preferences (merge with existing)
+    # Update preferences (merge with existing); assign a new dict so the
+    # JSON column is marked dirty
     if 'preferences' in data and isinstance(data['preferences'], dict):
-        if current_user.preferences is None:
-            current_user.preferences = {}
-        current_user.preferences.update(data['preferences'])
+        current_user.preferences = {**(current_user.preferences or {}), **data['preferences']}
 
     db.session.commit()
+    cache.delete(profile_cache_key(current_user.id))
 
     return jsonify({
         'message': 'Profile updated',
@@ -163,5 +187,6 @@ def change_password():
 
     current_user.set_password(new_password)
     db.session.commit()
+    cache.delete(profile_cache_key(current_user.id))
 
     return jsonify({'message': 'Password changed successfully'})
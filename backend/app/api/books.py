@@ -1,79 +1,267 @@
 """
 Books API routes
 """
-from flask import Blueprint, request, jsonify
+import base64
+import hashlib
+import json
+import re
+import uuid
+from functools import wraps
+from math import ceil
+
+from flask import Blueprint, current_app, request, jsonify, make_response
 from flask_login import current_user
+from sqlalchemy import func, select
+from sqlalchemy.dialects.mysql import match
 
-from app.models import Book, Favorite
+from app import db, cache, cache_timeout
+from app.models import Book, Favorite, Genre, BookGenre
 
 bp = Blueprint('books', __name__)
 
+# InnoDB doesn't index tokens shorter than innodb_ft_min_token_size (default 3)
+# or on its default stopword list, so a required +term made of one never matches
+FULLTEXT_MIN_TOKEN = 3
+FULLTEXT_STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for',
+    'from', 'how', 'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the',
+    'this', 'to', 'was', 'what', 'when', 'where', 'who', 'will', 'with', 'und',
+    'www',
+))
+_FULLTEXT_SPLIT = re.compile(r'\W+')
 
-@bp.route('', methods=['GET'])
-def list_books():
-    """List all books with optional filtering"""
-    # Query parameters
-    search = request.args.get('search', '').strip()
-    author = request.args.get('author', '').strip()
-    year_from = request.args.get('yearFrom', type=int)
-    year_to = request.args.get('yearTo', type=int)
-    genre = request.args.get('genre', '').strip()
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('perPage', 50, type=int)
+# How long a filtered listing's total count stays cached
+TOTAL_CACHE_TIMEOUT = 60
+
+# Cache key for the author list; delete it whenever books change
+AUTHORS_CACHE_KEY = 'book_authors_v1'
+
+# Cache key for the genre list; delete it whenever books change
+GENRES_CACHE_KEY = 'book_genres_v1'
+
+# How long the author and genre lists stay cached
+LOOKUP_CACHE_TIMEOUT = 600
+
+# Listing pages are cached under the current catalog version; deleting
+# CATALOG_VERSION_KEY (as seeding does) retires every cached page at once.
+# Only done with a shared cache, where that delete reaches every worker
+CATALOG_VERSION_KEY = 'books_all'
+CATALOG_CACHE_TIMEOUT = 3600
+
+# How long browsers and CDNs may reuse public book metadata
+HTTP_CACHE_MAX_AGE = 300
+
+
+def _conditional(response, public=True):
+    """Tag a response with an ETag and Cache-Control, answering If-None-Match with 304"""
+    response.set_etag(hashlib.md5(response.get_data()).hexdigest())
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = HTTP_CACHE_MAX_AGE
+    else:
+        # Per-user payload: keep it out of shared caches, but allow revalidation
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _http_cached(view):
+    """Serve a view's response as public, conditionally cacheable content"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return _conditional(make_response(view(*args, **kwargs)))
+    return wrapper
+
+
+def _search_filter(search):
+    """Build the search predicate, using the FULLTEXT index on MySQL"""
+    # Split like InnoDB does and leave out the tokens it never indexes
+    terms = [
+        t for t in _FULLTEXT_SPLIT.split(search.lower())
+        if len(t) >= FULLTEXT_MIN_TOKEN and t not in FULLTEXT_STOPWORDS
+    ]
+
+    if db.engine.dialect.name == 'mysql' and terms:
+        # Every remaining term must match as a word prefix
+        against = ' '.join(f'+{t}*' for t in terms)
+        return match(
+            Book.title, Book.author, Book.description, against=against
+        ).in_boolean_mode()
+
+    # SQLite / only short or stop words: substring scan
+    search_term = f'%{search}%'
+    return (
+        (Book.title.ilike(search_term)) |
+        (Book.author.ilike(search_term)) |
+        (Book.description.ilike(search_term))
+    )
+
+
+def _count_books(stmt, filters):
+    """Count rows matching the listing filters, cached per filter set"""
+    digest = hashlib.md5(json.dumps(filters).encode('utf-8')).hexdigest()
+    cache_key = f'books_total:{digest}'
+
+    total = cache.get(cache_key)
+    if total is None:
+        total = db.session.scalar(
+            select(func.count()).select_from(stmt.order_by(None).subquery())
+        )
+        cache.set(cache_key, total, timeout=cache_timeout(TOTAL_CACHE_TIMEOUT))
+    return total
+
+
+def _encode_cursor(book):
+    """Encode a book's (title, id) sort key as an opaque cursor"""
+    raw = json.dumps([book.title, book.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
 
-    # Limit per_page
-    per_page = min(per_page, 100)
 
+def _decode_cursor(cursor):
+    """Decode a cursor into (title, id), or None if it is malformed"""
+    try:
+        title, book_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(title, str) or not isinstance(book_id, int):
+        return None
+    return title, book_id
+
+
+def _catalog_version():
+    """Current catalog version, minted when the catalog cache is reset"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(CATALOG_VERSION_KEY, version, timeout=0)
+    return version
+
+
+def _catalog_page(search, author, year_from, year_to, genre, after, page, per_page,
+                  with_total):
+    """One listing page as {'books': [...], 'meta': {...}}, or None for a bad cursor"""
     # Build query
-    query = Book.query
+    stmt = select(Book)
 
     if search:
-        search_term = f'%{search}%'
-        query = query.filter(
-            (Book.title.ilike(search_term)) |
-            (Book.author.ilike(search_term)) |
-            (Book.description.ilike(search_term))
-        )
+        stmt = stmt.where(_search_filter(search))
 
     if author:
-        query = query.filter(Book.author.ilike(f'%{author}%'))
+        stmt = stmt.where(Book.author.ilike(f'%{author}%'))
 
     if year_from:
-        query = query.filter(Book.year >= year_from)
+        stmt = stmt.where(Book.year >= year_from)
 
     if year_to:
-        query = query.filter(Book.year <= year_to)
+        stmt = stmt.where(Book.year <= year_to)
 
     if genre:
-        query = query.filter(Book.genres.contains([genre]))
+        stmt = stmt.where(Book.id.in_(
+            select(BookGenre.book_id)
+            .join(Genre, Genre.id == BookGenre.genre_id)
+            .where(Genre.name == genre)
+        ))
+
+    # Order by title, with id as tie-breaker so the keyset is unique
+    stmt = stmt.order_by(Book.title, Book.id)
+
+    total = None
+    if with_total:
+        filters = [search, author, year_from, year_to, genre]
+        total = _count_books(stmt, filters)
+
+    if page is not None:
+        # OFFSET pagination
+        stmt = stmt.offset((page - 1) * per_page)
+    elif after:
+        # Keyset pagination: seek past the last (title, id) seen
+        key = _decode_cursor(after)
+        if key is None:
+            return None
+        last_title, last_id = key
+        stmt = stmt.where(
+            (Book.title > last_title) |
+            ((Book.title == last_title) & (Book.id > last_id))
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    items = db.session.scalars(stmt.limit(per_page + 1)).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
+
+    meta = {'perPage': per_page, 'hasNext': has_next}
+    if page is not None:
+        meta['page'] = page
+        meta['hasPrev'] = page > 1
+    else:
+        meta['nextCursor'] = _encode_cursor(items[-1]) if has_next else None
+    if total is not None:
+        meta['total'] = total
+        meta['totalPages'] = ceil(total / per_page)
+
+    return {'books': [book.to_dict() for book in items], 'meta': meta}
+
+
+@bp.route('', methods=['GET'])
+def list_books():
+    """List all books with optional filtering
 
-    # Order by title
-    query = query.order_by(Book.title)
+    Paginates by keyset on (title, id): pass the previous response's
+    ``nextCursor`` as ``after``. Passing ``page`` instead falls back to
+    OFFSET pagination, for UIs that show page numbers. The total count is
+    only computed when ``withTotal=1`` is passed.
+    """
+    # Query parameters
+    search = request.args.get('search', '').strip()
+    author = request.args.get('author', '').strip()
+    year_from = request.args.get('yearFrom', type=int)
+    year_to = request.args.get('yearTo', type=int)
+    genre = request.args.get('genre', '').strip()
+    after = request.args.get('after', '').strip()
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('perPage', 50, type=int)
+    with_total = request.args.get('withTotal', '').lower() in ('1', 'true')
+
+    # Limit per_page
+    per_page = max(min(per_page, 100), 1)
+    if page is not None:
+        page = max(page, 1)
+
+    # The catalog only changes on reseed, so pages are shared by all users
+    params = [search, author, year_from, year_to, genre, after, page, per_page, with_total]
+    shared = current_app.config['CACHE_SHARED']
+    if shared:
+        digest = hashlib.md5(json.dumps(params).encode('utf-8')).hexdigest()
+        cache_key = f'books_page:{_catalog_version()}:{digest}'
+        result = cache.get(cache_key)
+    else:
+        result = None
 
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if result is None:
+        result = _catalog_page(*params)
+        if result is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        if shared:
+            cache.set(cache_key, result, timeout=CATALOG_CACHE_TIMEOUT)
 
-    # Get user's favorites if logged in
+    # Get which of this page's books the user has favorited
     user_favorites = set()
-    if current_user.is_authenticated:
-        user_favorites = {f.book_id for f in current_user.favorites}
+    if current_user.is_authenticated and result['books']:
+        page_ids = [book['id'] for book in result['books']]
+        user_favorites = set(db.session.scalars(
+            select(Favorite.book_id).where(
+                Favorite.user_id == current_user.id,
+                Favorite.book_id.in_(page_ids)
+            )
+        ))
 
     # Build response
-    books = []
-    for book in pagination.items:
-        book_dict = book.to_dict()
-        book_dict['isFavorite'] = book.id in user_favorites
-        books.append(book_dict)
-
-    return jsonify({
-        'books': books,
-        'total': pagination.total,
-        'page': pagination.page,
-        'perPage': pagination.per_page,
-        'totalPages': pagination.pages,
-        'hasNext': pagination.has_next,
-        'hasPrev': pagination.has_prev
-    })
+    books = [
+        {**book, 'isFavorite': book['id'] in user_favorites}
+        for book in result['books']
+    ]
+
+    return jsonify({'books': books, **result['meta']})
 
 
 @bp.route('/<int:book_id>', methods=['GET'])
@@ -91,7 +279,8 @@ def get_book(book_id):
         ).first() is not None
         book_dict['isFavorite'] = is_fav
 
-    return jsonify(book_dict)
+    # isFavorite makes the payload user-specific
+    return _conditional(jsonify(book_dict), public='isFavorite' not in book_dict)
 
 
 @bp.route('/slug/<slug>', methods=['GET'])
@@ -109,38 +298,34 @@ def get_book_by_slug(slug):
         ).first() is not None
         book_dict['isFavorite'] = is_fav
 
-    return jsonify(book_dict)
+    # isFavorite makes the payload user-specific
+    return _conditional(jsonify(book_dict), public='isFavorite' not in book_dict)
 
 
 @bp.route('/authors', methods=['GET'])
+@_http_cached
 def list_authors():
     """Get list of unique authors"""
-    authors = (
-        Book.query
-        .with_entities(Book.author)
-        .distinct()
-        .order_by(Book.author)
-        .all()
-    )
-    return jsonify({'authors': [a[0] for a in authors]})
+    authors = cache.get(AUTHORS_CACHE_KEY)
+    if authors is None:
+        rows = (
+            Book.query
+            .with_entities(Book.author)
+            .distinct()
+            .order_by(Book.author)
+            .all()
+        )
+        authors = [a[0] for a in rows]
+        cache.set(AUTHORS_CACHE_KEY, authors, timeout=cache_timeout(LOOKUP_CACHE_TIMEOUT))
+    return jsonify({'authors': authors})
 
 
 @bp.route('/genres', methods=['GET'])
+@_http_cached
 def list_genres():
     """Get list of unique genres"""
-    # Since genres is a JSON array, we need to handle this differently
-    # For now, return a static list based on common genres
-    genres = [
-        'Fiction',
-        'Classic',
-        'Gothic',
-        'Horror',
-        'Romance',
-        'Adventure',
-        'Mystery',
-        'Fantasy',
-        'Science Fiction',
-        'Historical Fiction',
-        'Literary Fiction'
-    ]
+    genres = cache.get(GENRES_CACHE_KEY)
+    if genres is None:
+        genres = list(db.session.scalars(select(Genre.name).order_by(Genre.name)))
+        cache.set(GENRES_CACHE_KEY, genres, timeout=cache_timeout(LOOKUP_CACHE_TIMEOUT))
     return jsonify({'genres': genres})
@@ -2,14 +2,20 @@
 User Library API routes (favorites, progress, goals)
 """
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_login import login_required, current_user
+from sqlalchemy import (
+    bindparam, case, delete, insert, literal, null, select, type_coerce, union_all
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 from app import db
 from app.models import (
     Book, UserLibrary, LibraryStatus,
-    ReadingProgress, Favorite, ReadingGoal
+    ReadingProgress, Favorite, ReadingGoal, UserYearStats
 )
+from app.models.upsert import upsert
 
 bp = Blueprint('library', __name__)
 
@@ -18,85 +24,214 @@ bp = Blueprint('library', __name__)
 # LIBRARY DASHBOARD
 # ============================================================
 
-@bp.route('/library', methods=['GET'])
-@login_required
-def get_library():
-    """Get user's complete library data for dashboard"""
-    user_id = current_user.id
-    current_year = datetime.now().year
-
-    # Get library items by status
-    currently_reading = (
-        UserLibrary.query
-        .filter_by(user_id=user_id, status=LibraryStatus.READING)
-        .all()
+# Book columns selected alongside library rows, keyed as in Book.to_dict()
+BOOK_COLUMNS = {
+    'id': Book.id,
+    'slug': Book.slug,
+    'title': Book.title,
+    'author': Book.author,
+    'year': Book.year,
+    'language': Book.language,
+    'description': Book.description,
+    'coverPath': Book.cover_path,
+    'totalPages': Book.total_pages,
+    'sourceUrl': Book.source_url,
+    'license': Book.license,
+    'genres': Book.genres,
+}
+
+FAVORITE_COLUMNS = (Favorite.id, Favorite.user_id, Favorite.book_id, Favorite.created_at)
+
+
+def _select_with_book(model, *columns):
+    """SELECT ``columns`` of ``model`` joined to its book's to_dict() columns"""
+    book_columns = [col.label(f'book__{key}') for key, col in BOOK_COLUMNS.items()]
+    return (
+        select(*columns, *book_columns)
+        .select_from(model)
+        .join(Book, Book.id == model.book_id)
     )
 
-    finished_books = (
-        UserLibrary.query
-        .filter_by(user_id=user_id, status=LibraryStatus.FINISHED)
-        .order_by(UserLibrary.finished_at.desc())
-        .limit(20)
-        .all()
+
+def _book_from_row(row):
+    book = {key: row[f'book__{key}'] for key in BOOK_COLUMNS}
+    book['genres'] = book['genres'] or []
+    return book
+
+
+def _library_item_from_row(row):
+    """Same shape as UserLibrary.to_dict(include_book=True)"""
+    row = row._mapping
+    return {
+        'id': row['id'],
+        'userId': row['user_id'],
+        'bookId': row['book_id'],
+        'status': row['status'].value,
+        'addedAt': row['added_at'],
+        'updatedAt': row['updated_at'],
+        'finishedAt': row['finished_at'],
+        'book': _book_from_row(row),
+    }
+
+
+def _favorite_from_row(row):
+    """Same shape as Favorite.to_dict(include_book=True)"""
+    row = row._mapping
+    return {
+        'id': row['id'],
+        'userId': row['user_id'],
+        'bookId': row['book_id'],
+        'createdAt': row['created_at'],
+        'book': _book_from_row(row),
+    }
+
+
+def _reading_item_from_row(row):
+    """Library item plus its reading progress, if any"""
+    data = _library_item_from_row(row)
+    row = row._mapping
+    if row['progress_id'] is not None:
+        data['progress'] = {
+            'lastPage': row['progress_last_page'],
+            'lastCfi': row['progress_last_cfi'],
+            'percentage': row['progress_percentage'],
+            'lastReadAt': row['progress_last_read_at']
+        }
+    return data
+
+
+# Dashboard buckets, in the order the UNION ALL returns them
+READING_BUCKET, FINISHED_BUCKET, WANT_TO_READ_BUCKET, FAVORITES_BUCKET, GOAL_BUCKET = range(5)
+
+# Every dashboard row has these columns; each bucket fills in the ones it uses
+DASHBOARD_COLUMNS = {
+    'id': UserLibrary.id,
+    'user_id': UserLibrary.user_id,
+    'book_id': UserLibrary.book_id,
+    'status': UserLibrary.status,
+    'added_at': UserLibrary.added_at,
+    'updated_at': UserLibrary.updated_at,
+    'finished_at': UserLibrary.finished_at,
+    'created_at': Favorite.created_at,
+    'progress_id': ReadingProgress.id,
+    'progress_last_page': ReadingProgress.last_page,
+    'progress_last_cfi': ReadingProgress.last_cfi,
+    'progress_percentage': ReadingProgress.percentage,
+    'progress_last_read_at': ReadingProgress.last_read_at,
+    'goal_target': ReadingGoal.target_books,
+    'goal_completed': UserYearStats.finished_count,
+    'sort_at': UserLibrary.added_at,
+    **{f'book__{key}': col for key, col in BOOK_COLUMNS.items()},
+}
+
+_LIBRARY_FIELDS = {name: DASHBOARD_COLUMNS[name] for name in (
+    'id', 'user_id', 'book_id', 'status', 'added_at', 'updated_at', 'finished_at',
+)}
+_PROGRESS_FIELDS = {name: DASHBOARD_COLUMNS[name] for name in (
+    'progress_id', 'progress_last_page', 'progress_last_cfi',
+    'progress_percentage', 'progress_last_read_at',
+)}
+_BOOK_FIELDS = {name: col for name, col in DASHBOARD_COLUMNS.items()
+                if name.startswith('book__')}
+
+
+def _dashboard_select(bucket, **columns):
+    """One UNION ALL member: the given columns, typed NULLs for the rest"""
+    return select(
+        literal(bucket).label('bucket'),
+        *(
+            (columns[name] if name in columns else type_coerce(null(), col.type)).label(name)
+            for name, col in DASHBOARD_COLUMNS.items()
+        )
     )
 
-    want_to_read = (
-        UserLibrary.query
-        .filter_by(user_id=user_id, status=LibraryStatus.WANT_TO_READ)
-        .order_by(UserLibrary.added_at.desc())
-        .all()
+
+def _library_bucket(bucket, status, **columns):
+    return (
+        _dashboard_select(bucket, **_LIBRARY_FIELDS, **_BOOK_FIELDS, **columns)
+        .select_from(UserLibrary)
+        .join(Book, Book.id == UserLibrary.book_id)
+        .where(UserLibrary.user_id == bindparam('user_id'), UserLibrary.status == status)
     )
 
-    # Get favorites
+
+def _build_dashboard_stmt():
+    """Whole dashboard in one round trip, executed with {'user_id', 'year'}"""
+    reading = _library_bucket(READING_BUCKET, LibraryStatus.READING, **_PROGRESS_FIELDS).outerjoin(
+        ReadingProgress, (ReadingProgress.user_id == UserLibrary.user_id) &
+                         (ReadingProgress.book_id == UserLibrary.book_id)
+    )
+    # LIMIT needs its own derived table inside a UNION
+    finished = select(
+        _library_bucket(FINISHED_BUCKET, LibraryStatus.FINISHED, sort_at=UserLibrary.finished_at)
+        .order_by(UserLibrary.finished_at.desc(), UserLibrary.id.desc())
+        .limit(20)
+        .subquery()
+    )
+    want_to_read = _library_bucket(
+        WANT_TO_READ_BUCKET, LibraryStatus.WANT_TO_READ, sort_at=UserLibrary.added_at
+    )
     favorites = (
-        Favorite.query
-        .filter_by(user_id=user_id)
-        .order_by(Favorite.created_at.desc())
-        .all()
+        _dashboard_select(
+            FAVORITES_BUCKET,
+            id=Favorite.id, user_id=Favorite.user_id, book_id=Favorite.book_id,
+            created_at=Favorite.created_at, sort_at=Favorite.created_at, **_BOOK_FIELDS,
+        )
+        .select_from(Favorite)
+        .join(Book, Book.id == Favorite.book_id)
+        .where(Favorite.user_id == bindparam('user_id'))
+    )
+    # Always exactly one row, even with no goal or stats yet
+    goal = _dashboard_select(
+        GOAL_BUCKET,
+        goal_target=select(ReadingGoal.target_books).where(
+            ReadingGoal.user_id == bindparam('user_id'),
+            ReadingGoal.year == bindparam('year'),
+        ).scalar_subquery(),
+        goal_completed=select(UserYearStats.finished_count).where(
+            UserYearStats.user_id == bindparam('user_id'),
+            UserYearStats.year == bindparam('year'),
+        ).scalar_subquery(),
     )
 
-    # Get reading progress for currently reading books
-    progress_map = {}
-    if currently_reading:
-        book_ids = [item.book_id for item in currently_reading]
-        progress_items = (
-            ReadingProgress.query
-            .filter(ReadingProgress.user_id == user_id)
-            .filter(ReadingProgress.book_id.in_(book_ids))
-            .all()
-        )
-        progress_map = {p.book_id: p for p in progress_items}
+    rows = union_all(reading, finished, want_to_read, favorites, goal).subquery()
+    # Timestamps have one-second resolution; newer ids win ties
+    return select(rows).order_by(rows.c.bucket, rows.c.sort_at.desc(), rows.c.id.desc())
 
-    # Get current year's goal
-    goal = ReadingGoal.query.filter_by(user_id=user_id, year=current_year).first()
-
-    # Count books finished this year
-    year_start = datetime(current_year, 1, 1)
-    books_finished_this_year = (
-        UserLibrary.query
-        .filter_by(user_id=user_id, status=LibraryStatus.FINISHED)
-        .filter(UserLibrary.finished_at >= year_start)
-        .count()
-    )
 
-    # Build response
-    def format_reading_item(item):
-        data = item.to_dict(include_book=True)
-        if item.book_id in progress_map:
-            progress = progress_map[item.book_id]
-            data['progress'] = {
-                'lastPage': progress.last_page,
-                'lastCfi': progress.last_cfi,
-                'percentage': progress.percentage,
-                'lastReadAt': progress.last_read_at.isoformat() if progress.last_read_at else None
-            }
-        return data
+_DASHBOARD_STMT = _build_dashboard_stmt()
+
+_FAVORITES_STMT = (
+    _select_with_book(Favorite, *FAVORITE_COLUMNS)
+    .where(Favorite.user_id == bindparam('user_id'))
+    .order_by(Favorite.created_at.desc(), Favorite.id.desc())
+)
+
+
+@bp.route('/library', methods=['GET'])
+@login_required
+def get_library():
+    """Get user's complete library data for dashboard"""
+    current_year = datetime.now().year
+
+    buckets = {bucket: [] for bucket in range(GOAL_BUCKET + 1)}
+    for row in db.session.execute(
+        _DASHBOARD_STMT, {'user_id': current_user.id, 'year': current_year}
+    ):
+        buckets[row.bucket].append(row)
+
+    currently_reading = buckets[READING_BUCKET]
+    finished_books = buckets[FINISHED_BUCKET]
+    want_to_read = buckets[WANT_TO_READ_BUCKET]
+    favorites = buckets[FAVORITES_BUCKET]
+    goal_target = buckets[GOAL_BUCKET][0].goal_target or 0
+    books_finished_this_year = buckets[GOAL_BUCKET][0].goal_completed or 0
 
     return jsonify({
-        'currentlyReading': [format_reading_item(item) for item in currently_reading],
-        'finished': [item.to_dict(include_book=True) for item in finished_books],
-        'wantToRead': [item.to_dict(include_book=True) for item in want_to_read],
-        'favorites': [f.to_dict(include_book=True) for f in favorites],
+        'currentlyReading': [_reading_item_from_row(row) for row in currently_reading],
+        'finished': [_library_item_from_row(row) for row in finished_books],
+        'wantToRead': [_library_item_from_row(row) for row in want_to_read],
+        'favorites': [_favorite_from_row(row) for row in favorites],
         'stats': {
             'totalBooks': len(currently_reading) + len(finished_books) + len(want_to_read),
             'currentlyReading': len(currently_reading),
@@ -106,11 +241,11 @@ def get_library():
         },
         'goal': {
             'year': current_year,
-            'target': goal.target_books if goal else 0,
+            'target': goal_target,
             'completed': books_finished_this_year,
             'progress': (
-                round((books_finished_this_year / goal.target_books) * 100)
-                if goal and goal.target_books > 0
+                round((books_finished_this_year / goal_target) * 100)
+                if goal_target > 0
                 else 0
             )
         }
@@ -125,14 +260,9 @@ def get_library():
 @login_required
 def get_favorites():
     """Get user's favorite books"""
-    favorites = (
-        Favorite.query
-        .filter_by(user_id=current_user.id)
-        .order_by(Favorite.created_at.desc())
-        .all()
-    )
+    favorites = db.session.execute(_FAVORITES_STMT, {'user_id': current_user.id})
     return jsonify({
-        'favorites': [f.to_dict(include_book=True) for f in favorites]
+        'favorites': [_favorite_from_row(row) for row in favorites]
     })
 
 
@@ -140,30 +270,43 @@ def get_favorites():
 @login_required
 def toggle_favorite(book_id):
     """Toggle a book's favorite status"""
-    book = Book.query.get_or_404(book_id)
+    user_id = current_user.id
 
-    existing = Favorite.query.filter_by(
-        user_id=current_user.id,
-        book_id=book_id
-    ).first()
+    # Remove from favorites if present
+    removed = db.session.execute(
+        delete(Favorite)
+        .where(Favorite.user_id == user_id, Favorite.book_id == book_id)
+    ).rowcount
 
-    if existing:
-        # Remove from favorites
-        db.session.delete(existing)
+    if removed:
         db.session.commit()
         return jsonify({
             'isFavorite': False,
             'message': 'Removed from favorites'
         })
+
+    # Add to favorites; selecting from books inserts nothing for an unknown book
+    try:
+        added = db.session.execute(
+            insert(Favorite).from_select(
+                ['user_id', 'book_id'],
+                select(literal(user_id), Book.id).where(Book.id == book_id)
+            )
+        ).rowcount
+    except IntegrityError:
+        # A concurrent request favorited it first
+        db.session.rollback()
+        added = 1
     else:
-        # Add to favorites
-        favorite = Favorite(user_id=current_user.id, book_id=book_id)
-        db.session.add(favorite)
         db.session.commit()
-        return jsonify({
-            'isFavorite': True,
-            'message': 'Added to favorites'
-        })
+
+    if not added:
+        abort(404)
+
+    return jsonify({
+        'isFavorite': True,
+        'message': 'Added to favorites'
+    })
 
 
 @bp.route('/favorites/<int:book_id>', methods=['DELETE'])
@@ -190,13 +333,18 @@ def remove_favorite(book_id):
 @login_required
 def get_progress(book_id):
     """Get reading progress for a book"""
-    book = Book.query.get_or_404(book_id)
-
-    progress = ReadingProgress.query.filter_by(
-        user_id=current_user.id,
-        book_id=book_id
+    row = db.session.execute(
+        select(Book.total_pages, ReadingProgress)
+        .outerjoin(ReadingProgress, (ReadingProgress.book_id == Book.id) &
+                   (ReadingProgress.user_id == current_user.id))
+        .where(Book.id == book_id)
     ).first()
 
+    if row is None:
+        abort(404)
+
+    total_pages, progress = row
+
     if not progress:
         return jsonify({
             'bookId': book_id,
@@ -204,7 +352,7 @@ def get_progress(book_id):
             'lastCfi': None,
             'percentage': 0,
             'lastReadAt': None,
-            'totalPages': book.total_pages
+            'totalPages': total_pages
         })
 
     return jsonify({
@@ -212,8 +360,8 @@ def get_progress(book_id):
         'lastPage': progress.last_page,
         'lastCfi': progress.last_cfi,
         'percentage': progress.percentage,
-        'lastReadAt': progress.last_read_at.isoformat() if progress.last_read_at else None,
-        'totalPages': book.total_pages
+        'lastReadAt': progress.last_read_at,
+        'totalPages': total_pages
     })
 
 
@@ -221,61 +369,66 @@ def get_progress(book_id):
 @login_required
 def update_progress(book_id):
     """Update reading progress for a book"""
-    book = Book.query.get_or_404(book_id)
     data = request.get_json()
 
     if not data:
         return jsonify({'error': 'No data provided'}), 400
 
-    # Get or create progress
-    progress = ReadingProgress.query.filter_by(
-        user_id=current_user.id,
-        book_id=book_id
-    ).first()
+    user_id = current_user.id
+    now = db.func.now()
+
+    # Fields to update
+    fields = {
+        column: data[key]
+        for key, column in (('lastPage', 'last_page'),
+                            ('lastCfi', 'last_cfi'),
+                            ('percentage', 'percentage'))
+        if key in data
+    }
+    fields['last_read_at'] = now
 
-    if not progress:
-        progress = ReadingProgress(
-            user_id=current_user.id,
-            book_id=book_id
+    try:
+        # Create or update progress in one statement
+        upsert(
+            ReadingProgress,
+            {'user_id': user_id, 'book_id': book_id, **fields},
+            index_elements=['user_id', 'book_id'],
+            set_=fields,
         )
-        db.session.add(progress)
 
-    # Update fields
-    if 'lastPage' in data:
-        progress.last_page = data['lastPage']
-
-    if 'lastCfi' in data:
-        progress.last_cfi = data['lastCfi']
-
-    if 'percentage' in data:
-        progress.percentage = data['percentage']
+        # Auto-update library status to "reading" if not already
+        promote = UserLibrary.status == LibraryStatus.WANT_TO_READ
+        upsert(
+            UserLibrary,
+            {'user_id': user_id, 'book_id': book_id, 'status': LibraryStatus.READING},
+            index_elements=['user_id', 'book_id'],
+            # updated_at first: MySQL applies these assignments in order
+            set_={
+                'updated_at': case((promote, now), else_=UserLibrary.updated_at),
+                'status': case(
+                    (promote, literal(LibraryStatus.READING, UserLibrary.status.type)),
+                    else_=UserLibrary.status
+                ),
+            },
+        )
+    except IntegrityError:
+        # Foreign key violation: the book doesn't exist
+        db.session.rollback()
+        abort(404)
 
-    progress.last_read_at = datetime.utcnow()
+    db.session.commit()
 
-    # Auto-update library status to "reading" if not already
-    library_item = UserLibrary.query.filter_by(
-        user_id=current_user.id,
+    progress = ReadingProgress.query.filter_by(
+        user_id=user_id,
         book_id=book_id
     ).first()
 
-    if not library_item:
-        library_item = UserLibrary(
-            user_id=current_user.id,
-            book_id=book_id,
-            status=LibraryStatus.READING
-        )
-        db.session.add(library_item)
-    elif library_item.status == LibraryStatus.WANT_TO_READ:
-        library_item.status = LibraryStatus.READING
-
-    db.session.commit()
-
     return jsonify({
         'message': 'Progress updated',
         'lastPage': progress.last_page,
         'lastCfi': progress.last_cfi,
         'percentage': progress.percentage,
-        'lastReadAt': progress.last_read_at.isoformat()
+        'lastReadAt': progress.last_read_at
     })
 
 
@@ -305,8 +458,8 @@ def get_library_item(book_id):
         'bookId': book_id,
         'inLibrary': True,
         'status': item.status.value,
-        'addedAt': item.added_at.isoformat() if item.added_at else None,
-        'finishedAt': item.finished_at.isoformat() if item.finished_at else None
+        'addedAt': item.added_at,
+        'finishedAt': item.finished_at
     })
 
 
@@ -328,11 +481,12 @@ def update_library_status(book_id):
             'error': f'Invalid status. Must be one of: {[s.value for s in LibraryStatus]}'
         }), 400
 
-    # Get or create library item
+    # Get or create library item, locking it so concurrent updates can't
+    # both read the old status and double-adjust the finished counter
     item = UserLibrary.query.filter_by(
         user_id=current_user.id,
         book_id=book_id
-    ).first()
+    ).with_for_update().first()
 
     if not item:
         item = UserLibrary(
@@ -341,11 +495,16 @@ def update_library_status(book_id):
         )
         db.session.add(item)
 
+    # Move the finished counter out of the year the book was last finished
+    if item.status == LibraryStatus.FINISHED and item.finished_at:
+        UserYearStats.adjust_finished(current_user.id, item.finished_at.year, -1)
+
     item.status = status
 
     # Set finished_at if marking as finished
     if status == LibraryStatus.FINISHED:
         item.finished_at = datetime.utcnow()
+        UserYearStats.adjust_finished(current_user.id, item.finished_at.year, 1)
     else:
         item.finished_at = None
 
@@ -354,7 +513,7 @@ def update_library_status(book_id):
     return jsonify({
         'message': 'Library status updated',
         'status': item.status.value,
-        'finishedAt': item.finished_at.isoformat() if item.finished_at else None
+        'finishedAt': item.finished_at
     })
 
 
@@ -365,9 +524,11 @@ def remove_from_library(book_id):
     item = UserLibrary.query.filter_by(
         user_id=current_user.id,
         book_id=book_id
-    ).first()
+    ).with_for_update().first()
 
     if item:
+        if item.status == LibraryStatus.FINISHED and item.finished_at:
+            UserYearStats.adjust_finished(current_user.id, item.finished_at.year, -1)
         db.session.delete(item)
         db.session.commit()
 
@@ -390,14 +551,8 @@ def get_goals():
         year=current_year
     ).first()
 
-    # Count books finished this year
-    year_start = datetime(current_year, 1, 1)
-    books_finished = (
-        UserLibrary.query
-        .filter_by(user_id=current_user.id, status=LibraryStatus.FINISHED)
-        .filter(UserLibrary.finished_at >= year_start)
-        .count()
-    )
+    # Books finished this year
+    books_finished = UserYearStats.get_finished_count(current_user.id, current_year)
 
     return jsonify({
         'year': current_year,
@@ -443,13 +598,7 @@ def update_goal():
     db.session.commit()
 
     # Get completed count
-    year_start = datetime(current_year, 1, 1)
-    books_finished = (
-        UserLibrary.query
-        .filter_by(user_id=current_user.id, status=LibraryStatus.FINISHED)
-        .filter(UserLibrary.finished_at >= year_start)
-        .count()
-    )
+    books_finished = UserYearStats.get_finished_count(current_user.id, current_year)
 
     return jsonify({
         'message': 'Goal updated',
@@ -473,8 +622,9 @@ def get_recent():
 
     recent = (
         ReadingProgress.query
+        .options(selectinload(ReadingProgress.book))
         .filter_by(user_id=current_user.id)
-        .order_by(ReadingProgress.last_read_at.desc())
+        .order_by(ReadingProgress.last_read_at.desc(), ReadingProgress.id.desc())
         .limit(limit)
         .all()
     )
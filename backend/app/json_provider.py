@@ -0,0 +1,30 @@
+"""
+orjson-backed JSON provider
+"""
+import orjson
+from flask.json.provider import JSONProvider
+
+# Timestamps are stored as naive UTC (server NOW() runs in UTC), so tag them as such
+DUMPS_OPTIONS = orjson.OPT_NAIVE_UTC
+
+
+class OrjsonProvider(JSONProvider):
+    """Serialize responses with orjson instead of the stdlib json module"""
+
+    mimetype = 'application/json'
+
+    def _options(self, indent=False):
+        return DUMPS_OPTIONS | orjson.OPT_INDENT_2 if indent else DUMPS_OPTIONS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build the response from orjson's bytes without a str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self._app.debug
+        body = orjson.dumps(obj, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
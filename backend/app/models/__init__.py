@@ -3,17 +3,22 @@ Database models
 """
 from .user import User
 from .book import Book
+from .genre import Genre, BookGenre
 from .user_library import UserLibrary, LibraryStatus
 from .reading_progress import ReadingProgress
 from .favorite import Favorite
 from .reading_goal import ReadingGoal
+from .user_year_stats import UserYearStats
 
 __all__ = [
     'User',
     'Book',
+    'Genre',
+    'BookGenre',
     'UserLibrary',
     'LibraryStatus',
     'ReadingProgress',
     'Favorite',
-    'ReadingGoal'
+    'ReadingGoal',
+    'UserYearStats'
 ]
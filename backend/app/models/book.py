@@ -1,7 +1,6 @@
 """
 Book model
 """
-from datetime import datetime
 from app import db
 
 
@@ -28,13 +27,21 @@ class Book(db.Model):
     license = db.Column(db.String(100), default='Public Domain')
     genres = db.Column(db.JSON, default=list)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        # Keyset pagination order for the catalog listing
+        db.Index('ix_books_title_id', 'title', 'id'),
+        # FULLTEXT index backing title/author/description search (MySQL only)
+        db.Index('ft_books_search', 'title', 'author', 'description',
+                 mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
 
     # Relationships
-    library_items = db.relationship('UserLibrary', back_populates='book', lazy='dynamic')
-    reading_progress = db.relationship('ReadingProgress', back_populates='book', lazy='dynamic')
-    favorites = db.relationship('Favorite', back_populates='book', lazy='dynamic')
+    library_items = db.relationship('UserLibrary', back_populates='book', lazy='select')
+    reading_progress = db.relationship('ReadingProgress', back_populates='book', lazy='select')
+    favorites = db.relationship('Favorite', back_populates='book', lazy='select')
 
     def to_dict(self, include_file_path=False):
         """Convert to dictionary"""
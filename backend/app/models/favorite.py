@@ -1,7 +1,6 @@
 """
 Favorite model - tracks user's favorite books
 """
-from datetime import datetime
 from app import db
 
 
@@ -15,7 +14,7 @@ class Favorite(db.Model):
     book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'),
                         nullable=False, index=True)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
 
     # Relationships
     user = db.relationship('User', back_populates='favorites')
@@ -27,12 +26,18 @@ class Favorite(db.Model):
     )
 
     def to_dict(self, include_book=False):
-        """Convert to dictionary"""
+        """Convert to dictionary
+
+        With include_book=True, eager-load the book in the query
+        (selectinload(Favorite.book)). Otherwise each row lazy-loads it in
+        production and raises InvalidRequestError in development and
+        testing (SQLALCHEMY_RAISELOAD).
+        """
         data = {
             'id': self.id,
             'userId': self.user_id,
             'bookId': self.book_id,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'createdAt': self.created_at,
         }
         if include_book and self.book:
             data['book'] = self.book.to_dict()
@@ -0,0 +1,30 @@
+"""
+Genre models - normalized book genres for indexed filtering
+"""
+from app import db
+
+
+class Genre(db.Model):
+    """Book genre"""
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f'<Genre {self.name}>'
+
+
+class BookGenre(db.Model):
+    """Genres assigned to each book (mirrors Book.genres)"""
+    __tablename__ = 'book_genres'
+
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'),
+                        primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'),
+                         primary_key=True)
+
+    __table_args__ = (
+        # Genre-filtered listings look up books by genre
+        db.Index('ix_book_genres_genre_book', 'genre_id', 'book_id'),
+    )
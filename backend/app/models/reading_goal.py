@@ -1,7 +1,6 @@
 """
 Reading Goal model - tracks user's yearly reading goals
 """
-from datetime import datetime
 from app import db
 
 
@@ -16,8 +15,8 @@ class ReadingGoal(db.Model):
     year = db.Column(db.Integer, nullable=False)
     target_books = db.Column(db.Integer, default=12)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now(), onupdate=db.func.now())
 
     # Relationships
     user = db.relationship('User', back_populates='reading_goals')
@@ -34,7 +33,7 @@ class ReadingGoal(db.Model):
             'userId': self.user_id,
             'year': self.year,
             'targetBooks': self.target_books,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
         }
         return data
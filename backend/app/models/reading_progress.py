@@ -1,7 +1,6 @@
 """
 Reading Progress model - tracks user's reading position in a book
 """
-from datetime import datetime
 from app import db
 
 
@@ -11,9 +10,9 @@ class ReadingProgress(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
-                        nullable=False, index=True)
+                        nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'),
-                        nullable=False, index=True)
+                        nullable=False)
 
     # Progress tracking
     last_page = db.Column(db.Integer, default=1)
@@ -21,20 +20,28 @@ class ReadingProgress(db.Model):
     percentage = db.Column(db.Float, default=0.0)
 
     # Timestamps
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_read_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
+    last_read_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now(), onupdate=db.func.now())
 
     # Relationships
     user = db.relationship('User', back_populates='reading_progress')
     book = db.relationship('Book', back_populates='reading_progress')
 
-    # Unique constraint
     __table_args__ = (
+        # Unique constraint; also the (user_id, book_id) lookup index
         db.UniqueConstraint('user_id', 'book_id', name='unique_user_book_progress'),
+        # Reverse direction, for book-side lookups and the book_id foreign key
+        db.Index('ix_reading_progress_book_user', 'book_id', 'user_id'),
     )
 
     def to_dict(self, include_book=False):
-        """Convert to dictionary"""
+        """Convert to dictionary
+
+        With include_book=True, eager-load the book in the query
+        (selectinload(ReadingProgress.book)). Otherwise each row lazy-loads it in
+        production and raises InvalidRequestError in development and
+        testing (SQLALCHEMY_RAISELOAD).
+        """
         data = {
             'id': self.id,
             'userId': self.user_id,
@@ -42,8 +49,8 @@ class ReadingProgress(db.Model):
             'lastPage': self.last_page,
             'lastCfi': self.last_cfi,
             'percentage': self.percentage,
-            'startedAt': self.started_at.isoformat() if self.started_at else None,
-            'lastReadAt': self.last_read_at.isoformat() if self.last_read_at else None,
+            'startedAt': self.started_at,
+            'lastReadAt': self.last_read_at,
         }
         if include_book and self.book:
             data['book'] = self.book.to_dict()
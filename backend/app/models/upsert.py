@@ -0,0 +1,72 @@
+"""
+Dialect-aware single-statement upserts
+"""
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import db
+
+
+def upsert(model, values, index_elements, set_):
+    """INSERT ``values``, or UPDATE the conflicting row with ``set_``
+
+    ``index_elements`` names the unique key that detects the conflict
+    (MySQL uses whichever unique key collides). Expressions in ``set_``
+    that reference the model's columns see the existing row; on MySQL
+    they also see assignments made earlier in ``set_``, which is applied
+    in dict order.
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        stmt = mysql.insert(model).values(**values)
+        stmt = stmt.on_duplicate_key_update(list(set_.items()))
+    else:
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(model).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+
+    return db.session.execute(stmt)
+
+
+def upsert_many(model, rows, index_elements, update_columns):
+    """INSERT ``rows``, overwriting ``update_columns`` on conflict
+
+    Conflicting rows take the incoming values for ``update_columns``;
+    their other columns are left as they are. On MySQL the rows go out as
+    one multi-row INSERT; elsewhere they are sent as one executemany.
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        # PyMySQL only batches an executemany whose VALUES are all plain
+        # placeholders, which SQL defaults like now() rule out
+        stmt = mysql.insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {name: stmt.inserted[name] for name in update_columns}
+        )
+        return db.session.execute(stmt)
+
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: stmt.excluded[name] for name in update_columns},
+    )
+    return db.session.execute(stmt, rows)
+
+
+def insert_missing(model, rows, index_elements):
+    """INSERT ``rows`` in one statement, skipping any that hit ``index_elements``"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        # No-op assignment rather than INSERT IGNORE, which hides other errors too
+        stmt = mysql.insert(model).values(rows)
+        key = index_elements[0]
+        stmt = stmt.on_duplicate_key_update({key: model.__table__.c[key]})
+        return db.session.execute(stmt)
+
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return db.session.execute(stmt, rows)
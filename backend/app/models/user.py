@@ -1,14 +1,26 @@
 """
 User model
 """
-from datetime import datetime
 from flask_login import UserMixin
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
+from sqlalchemy.orm import deferred, make_transient_to_detached
 
-from app import db, login_manager
+from app import db, login_manager, cache, cache_timeout
 
-ph = PasswordHasher()
+# OWASP's minimum Argon2id profile (19 MiB, t=2, p=1); hashes made with the
+# library defaults are rehashed to it on the next successful login
+ph = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1, hash_len=32)
+
+# Columns load_user keeps in the cache; password_hash is left out and
+# loaded from the database only when accessed
+CACHED_COLUMNS = ('id', 'email', 'display_name', 'preferences', 'created_at', 'updated_at')
+PROFILE_CACHE_TIMEOUT = 60
+
+
+def profile_cache_key(user_id):
+    """Cache key for a user's cached columns"""
+    return f'user:{user_id}:profile'
 
 
 class User(UserMixin, db.Model):
@@ -17,22 +29,25 @@ class User(UserMixin, db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(255), nullable=False)
+    # Only login and password changes need the hash; undefer it there
+    password_hash = deferred(db.Column(db.String(255), nullable=False))
     display_name = db.Column(db.String(100), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now(), onupdate=db.func.now())
 
     # Preferences stored as JSON
     preferences = db.Column(db.JSON, default=dict)
 
-    # Relationships
-    library_items = db.relationship('UserLibrary', back_populates='user', lazy='dynamic',
+    # Relationships; nothing reads these per request, so they stay lazy rather
+    # than being selectin-loaded with every user. Routes query the library
+    # tables by user_id directly.
+    library_items = db.relationship('UserLibrary', back_populates='user', lazy='select',
                                      cascade='all, delete-orphan')
-    reading_progress = db.relationship('ReadingProgress', back_populates='user', lazy='dynamic',
+    reading_progress = db.relationship('ReadingProgress', back_populates='user', lazy='select',
                                         cascade='all, delete-orphan')
-    favorites = db.relationship('Favorite', back_populates='user', lazy='dynamic',
+    favorites = db.relationship('Favorite', back_populates='user', lazy='select',
                                  cascade='all, delete-orphan')
-    reading_goals = db.relationship('ReadingGoal', back_populates='user', lazy='dynamic',
+    reading_goals = db.relationship('ReadingGoal', back_populates='user', lazy='select',
                                      cascade='all, delete-orphan')
 
     def set_password(self, password):
@@ -58,9 +73,10 @@ class User(UserMixin, db.Model):
 
     def set_preference(self, key, value):
         """Set a user preference"""
-        if self.preferences is None:
-            self.preferences = {}
-        self.preferences[key] = value
+        # Assign a new dict so the JSON column is marked dirty
+        self.preferences = {**(self.preferences or {}), key: value}
+        # Preferences are served from the cached profile (see load_user)
+        cache.delete(profile_cache_key(self.id))
 
     def to_dict(self):
         """Convert to dictionary"""
@@ -69,11 +85,24 @@ class User(UserMixin, db.Model):
             'email': self.email,
             'displayName': self.display_name,
             'preferences': self.preferences or {},
-            'createdAt': self.created_at.isoformat() if self.created_at else None
+            'createdAt': self.created_at
         }
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login"""
-    return User.query.get(int(user_id))
+    """Load user by ID for Flask-Login, from the cache when possible"""
+    key = profile_cache_key(user_id)
+
+    cached = cache.get(key)
+    if cached is not None:
+        # Rebuild the row as if it were just loaded, without a SELECT
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = User.query.get(int(user_id))
+    if user is not None:
+        cache.set(key, {col: getattr(user, col) for col in CACHED_COLUMNS},
+                  timeout=cache_timeout(PROFILE_CACHE_TIMEOUT))
+    return user
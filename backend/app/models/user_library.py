@@ -1,7 +1,6 @@
 """
 User Library model - tracks which books a user has in their library
 """
-from datetime import datetime
 from enum import Enum
 from app import db
 
@@ -19,35 +18,49 @@ class UserLibrary(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
-                        nullable=False, index=True)
+                        nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'),
-                        nullable=False, index=True)
+                        nullable=False)
 
-    status = db.Column(db.Enum(LibraryStatus), default=LibraryStatus.WANT_TO_READ)
+    # Persist the lowercase values, matching the MySQL ENUM in the schema
+    status = db.Column(db.Enum(LibraryStatus, name='library_status',
+                               values_callable=lambda enum: [s.value for s in enum]),
+                       nullable=False, default=LibraryStatus.WANT_TO_READ)
 
-    added_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    added_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now(), onupdate=db.func.now())
     finished_at = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     user = db.relationship('User', back_populates='library_items')
     book = db.relationship('Book', back_populates='library_items')
 
-    # Unique constraint
     __table_args__ = (
+        # Unique constraint; also the (user_id, book_id) lookup index
         db.UniqueConstraint('user_id', 'book_id', name='unique_user_book'),
+        # Reverse direction, for book-side lookups and the book_id foreign key
+        db.Index('ix_userlib_book_user', 'book_id', 'user_id'),
+        # Dashboard lists: filter by (user, status), order/range by date
+        db.Index('ix_userlib_user_status_finished', 'user_id', 'status', 'finished_at'),
+        db.Index('ix_userlib_user_status_added', 'user_id', 'status', 'added_at'),
     )
 
     def to_dict(self, include_book=False):
-        """Convert to dictionary"""
+        """Convert to dictionary
+
+        With include_book=True, eager-load the book in the query
+        (selectinload(UserLibrary.book)). Otherwise each row lazy-loads it in
+        production and raises InvalidRequestError in development and
+        testing (SQLALCHEMY_RAISELOAD).
+        """
         data = {
             'id': self.id,
             'userId': self.user_id,
             'bookId': self.book_id,
             'status': self.status.value,
-            'addedAt': self.added_at.isoformat() if self.added_at else None,
-            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
-            'finishedAt': self.finished_at.isoformat() if self.finished_at else None,
+            'addedAt': self.added_at,
+            'updatedAt': self.updated_at,
+            'finishedAt': self.finished_at,
         }
         if include_book and self.book:
             data['book'] = self.book.to_dict()
@@ -0,0 +1,39 @@
+"""
+User Year Stats model - materialized per-year reading counters
+"""
+from app import db
+from .upsert import upsert
+
+
+class UserYearStats(db.Model):
+    """Books finished per user per year, kept in step with UserLibrary"""
+    __tablename__ = 'user_year_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    finished_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def adjust_finished(cls, user_id, year, delta):
+        """Add ``delta`` to the user's finished count for ``year``"""
+        upsert(
+            cls,
+            {'user_id': user_id, 'year': year, 'finished_count': max(delta, 0)},
+            index_elements=['user_id', 'year'],
+            # Never below zero, even if the row was created before a backfill
+            set_={'finished_count': db.case(
+                (cls.finished_count + delta < 0, 0),
+                else_=cls.finished_count + delta,
+            )},
+        )
+
+    @classmethod
+    def get_finished_count(cls, user_id, year):
+        """Number of books the user finished in ``year``"""
+        count = (
+            db.session.query(cls.finished_count)
+            .filter_by(user_id=user_id, year=year)
+            .scalar()
+        )
+        return count or 0
@@ -19,11 +19,28 @@ class Config:
         'sqlite:///myweb_books.db'
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Per-process pool; keep pool_size at or above GUNICORN_THREADS so
+    # threads never queue for a connection
     SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
         'pool_recycle': 300,
         'pool_pre_ping': True,
     }
 
+    # Raise on un-eager-loaded relationship access in library queries
+    SQLALCHEMY_RAISELOAD = False
+
+    # Cache (Redis when CACHE_REDIS_URL is set, in-process otherwise)
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache')
+    CACHE_DEFAULT_TIMEOUT = 300
+    # Invalidations only reach other processes (gunicorn workers, the seed
+    # script) through a shared backend; with an in-process cache, entries
+    # that are invalidated elsewhere live at most CACHE_LOCAL_TIMEOUT seconds
+    CACHE_SHARED = CACHE_TYPE not in ('SimpleCache', 'NullCache')
+    CACHE_LOCAL_TIMEOUT = 10
+
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -40,6 +57,7 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    SQLALCHEMY_RAISELOAD = True
 
 
 class ProductionConfig(Config):
@@ -53,6 +71,9 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # In-memory SQLite uses a StaticPool, which takes no pool options
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_RAISELOAD = True
 
 
 config = {
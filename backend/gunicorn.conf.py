@@ -0,0 +1,16 @@
+"""
+Gunicorn configuration
+
+Usage: gunicorn -c gunicorn.conf.py run:app
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Threaded workers: argon2 password hashing (signup/login/change password)
+# releases the GIL, so other requests keep running on the same worker
+# while a hash is computed
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
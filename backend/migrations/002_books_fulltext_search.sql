@@ -0,0 +1,7 @@
+-- Full-text search index for the books catalog
+-- Replaces the '%term%' LIKE scan in GET /api/books?search=...
+
+USE myweb_books;
+
+ALTER TABLE books
+    ADD FULLTEXT INDEX ft_books_search (title, author, description);
@@ -0,0 +1,6 @@
+-- Composite index for keyset pagination of GET /api/books
+-- Lets "WHERE (title, id) > (?, ?) ORDER BY title, id" run as an index range scan
+
+USE myweb_books;
+
+CREATE INDEX ix_books_title_id ON books (title, id);
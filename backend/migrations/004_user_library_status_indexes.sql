@@ -0,0 +1,11 @@
+-- Composite indexes for the library dashboard and reading goals
+-- (user_id, status, finished_at): finished list and "finished this year" count
+-- (user_id, status, added_at): want-to-read list ordered by added_at
+-- Both cover the (user_id, status) prefix, so idx_user_status is redundant
+
+USE myweb_books;
+
+CREATE INDEX ix_userlib_user_status_finished ON user_library (user_id, status, finished_at);
+CREATE INDEX ix_userlib_user_status_added ON user_library (user_id, status, added_at);
+
+DROP INDEX idx_user_status ON user_library;
@@ -0,0 +1,20 @@
+-- Materialized "books finished per year" counters
+-- Maintained by PATCH/DELETE /api/me/library/:bookId; read by the dashboard and goals
+
+USE myweb_books;
+
+CREATE TABLE IF NOT EXISTS user_year_stats (
+    user_id INT NOT NULL,
+    year INT NOT NULL,
+    finished_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Backfill from existing library data
+INSERT INTO user_year_stats (user_id, year, finished_count)
+SELECT user_id, YEAR(finished_at), COUNT(*)
+FROM user_library
+WHERE status = 'finished' AND finished_at IS NOT NULL
+GROUP BY user_id, YEAR(finished_at)
+ON DUPLICATE KEY UPDATE finished_count = VALUES(finished_count);
@@ -0,0 +1,30 @@
+-- Normalized genres for indexed genre filtering
+-- books.genres (JSON) stays as the serialized copy; book_genres is what GET /api/books?genre= queries
+
+USE myweb_books;
+
+CREATE TABLE IF NOT EXISTS genres (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS book_genres (
+    book_id INT NOT NULL,
+    genre_id INT NOT NULL,
+    PRIMARY KEY (book_id, genre_id),
+    FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
+    FOREIGN KEY (genre_id) REFERENCES genres(id) ON DELETE CASCADE,
+    INDEX ix_book_genres_genre_book (genre_id, book_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Backfill from the existing JSON column (re-running scripts/seed_db.py does the same)
+INSERT IGNORE INTO genres (name)
+SELECT DISTINCT jt.name
+FROM books,
+     JSON_TABLE(books.genres, '$[*]' COLUMNS (name VARCHAR(100) PATH '$')) AS jt;
+
+INSERT IGNORE INTO book_genres (book_id, genre_id)
+SELECT b.id, g.id
+FROM books b,
+     JSON_TABLE(b.genres, '$[*]' COLUMNS (name VARCHAR(100) PATH '$')) AS jt
+JOIN genres g ON g.name = jt.name;
@@ -0,0 +1,10 @@
+-- user_library.status is always set by the app; make it NOT NULL so the
+-- (user_id, status, ...) composite indexes never carry NULL status entries.
+-- The ORM now binds the enum values ('finished'), matching this ENUM.
+
+USE myweb_books;
+
+UPDATE user_library SET status = 'want_to_read' WHERE status IS NULL;
+
+ALTER TABLE user_library
+    MODIFY status ENUM('want_to_read', 'reading', 'finished') NOT NULL DEFAULT 'want_to_read';
@@ -0,0 +1,9 @@
+-- (book_id, user_id) indexes for reading_progress and user_library
+-- The unique (user_id, book_id) keys already serve per-user lookups; these
+-- cover the reverse direction. InnoDB drops the implicit single-column index
+-- it created for the book_id foreign key once these exist.
+
+USE myweb_books;
+
+CREATE INDEX ix_reading_progress_book_user ON reading_progress (book_id, user_id);
+CREATE INDEX ix_userlib_book_user ON user_library (book_id, user_id);
@@ -2,11 +2,23 @@
 Application entry point
 """
 import os
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import configure_mappers
+
 from app import create_app, db
 from app.models import User, Book, UserLibrary, ReadingProgress, Favorite, ReadingGoal
 
 app = create_app()
 
+# Pay mapper configuration and the first DB connection at worker startup
+# rather than on the first request
+configure_mappers()
+with app.app_context():
+    try:
+        db.engine.connect().close()
+    except OperationalError as e:
+        app.logger.warning('Could not warm the database pool: %s', e)
+
 
 @app.shell_context_processor
 def make_shell_context():
@@ -23,5 +35,10 @@ def make_shell_context():
 
 
 if __name__ == '__main__':
+    # The Werkzeug server is for local development only
+    if os.getenv('FLASK_ENV', 'development') != 'development':
+        raise SystemExit('Refusing to start the development server outside development; '
+                         'run "gunicorn -c gunicorn.conf.py run:app" instead')
+
     port = int(os.getenv('PORT', 5001))  # Default to 5001 (5000 often used by AirPlay on macOS)
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Database initialization script
-Creates all tables
+Creates all tables and upgrades existing SQLite dev databases
 """
 import os
 import sys
@@ -9,10 +9,34 @@ import sys
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import text
+
 from app import create_app, db
 from app.models import User, Book, UserLibrary, ReadingProgress, Favorite, ReadingGoal
 
 
+def upgrade_sqlite():
+    """Bring an existing SQLite dev database in line with the MySQL migrations"""
+    # 007: status holds the enum values ('reading'), not the member names ('READING')
+    result = db.session.execute(text(
+        "UPDATE user_library SET status = coalesce(lower(status), 'want_to_read') "
+        "WHERE status IS NULL OR status <> lower(status)"
+    ))
+    if result.rowcount:
+        print(f"Normalized {result.rowcount} library statuses")
+
+    # 005: rebuild the per-year finished counters from the library
+    db.session.execute(text("DELETE FROM user_year_stats"))
+    db.session.execute(text(
+        "INSERT INTO user_year_stats (user_id, year, finished_count) "
+        "SELECT user_id, CAST(strftime('%Y', finished_at) AS INTEGER), COUNT(*) "
+        "FROM user_library "
+        "WHERE status = 'finished' AND finished_at IS NOT NULL "
+        "GROUP BY user_id, strftime('%Y', finished_at)"
+    ))
+    db.session.commit()
+
+
 def init_db():
     """Initialize the database"""
     app = create_app()
@@ -22,6 +46,9 @@ def init_db():
         db.create_all()
         print("Database tables created successfully!")
 
+        if db.engine.dialect.name == 'sqlite':
+            upgrade_sqlite()
+
         # Print table info
         print("\nCreated tables:")
         for table in db.metadata.tables:
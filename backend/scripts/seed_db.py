@@ -5,70 +5,54 @@ Loads books from seed_library.json into the database
 """
 import os
 import sys
-import json
+import orjson
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app, db
-from app.models import Book
-
-
-# Mapping of book IDs from seed_library.json to file slugs
-BOOK_SLUG_MAP = {
-    1: 'pride_and_prejudice',
-    2: 'moby_dick',
-    3: 'frankenstein',
-    4: 'dracula',
-    5: 'sherlock_holmes',
-    6: 'alice_in_wonderland',
-    7: 'great_gatsby',
-    8: 'dorian_gray',
-    9: 'tale_of_two_cities',
-    10: 'jane_eyre',
-    11: 'wuthering_heights',
-    12: 'crime_and_punishment',
-    13: 'tom_sawyer',
-    14: 'huckleberry_finn',
-    15: 'war_and_peace',
-    16: 'count_of_monte_cristo',
-    17: 'wizard_of_oz',
-    18: 'treasure_island',
-    19: 'jekyll_and_hyde',
-    20: 'little_women',
-}
-
-# Genre assignments based on book content
-BOOK_GENRES = {
-    'pride_and_prejudice': ['Classic', 'Romance', 'Fiction'],
-    'moby_dick': ['Classic', 'Adventure', 'Fiction'],
-    'frankenstein': ['Classic', 'Gothic', 'Horror', 'Science Fiction'],
-    'dracula': ['Classic', 'Gothic', 'Horror'],
-    'sherlock_holmes': ['Classic', 'Mystery', 'Fiction'],
-    'alice_in_wonderland': ['Classic', 'Fantasy', 'Fiction'],
-    'great_gatsby': ['Classic', 'Literary Fiction'],
-    'dorian_gray': ['Classic', 'Gothic', 'Literary Fiction'],
-    'tale_of_two_cities': ['Classic', 'Historical Fiction'],
-    'jane_eyre': ['Classic', 'Romance', 'Gothic'],
-    'wuthering_heights': ['Classic', 'Romance', 'Gothic'],
-    'crime_and_punishment': ['Classic', 'Literary Fiction'],
-    'tom_sawyer': ['Classic', 'Adventure', 'Fiction'],
-    'huckleberry_finn': ['Classic', 'Adventure', 'Fiction'],
-    'war_and_peace': ['Classic', 'Historical Fiction', 'Literary Fiction'],
-    'count_of_monte_cristo': ['Classic', 'Adventure', 'Fiction'],
-    'wizard_of_oz': ['Classic', 'Fantasy', 'Fiction'],
-    'treasure_island': ['Classic', 'Adventure', 'Fiction'],
-    'jekyll_and_hyde': ['Classic', 'Gothic', 'Horror'],
-    'little_women': ['Classic', 'Fiction'],
-}
-
-
-def get_epub_path(slug, books_dir):
-    """Check if EPUB file exists and return path"""
-    epub_path = os.path.join(books_dir, f'{slug}.epub')
-    if os.path.exists(epub_path):
-        return f'books/{slug}.epub'
-    return None
+from app import create_app, db, cache
+from sqlalchemy import delete, insert, select
+
+from app.api.books import AUTHORS_CACHE_KEY, CATALOG_VERSION_KEY, GENRES_CACHE_KEY
+from app.models import Book, Genre, BookGenre
+from app.models.upsert import insert_missing, upsert_many
+
+
+def list_epub_slugs(books_dir):
+    """Slugs that have an EPUB file in books_dir, from a single directory scan"""
+    try:
+        with os.scandir(books_dir) as entries:
+            return {entry.name[:-len('.epub')] for entry in entries
+                    if entry.name.endswith('.epub') and entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+
+def sync_book_genres(genres_by_slug):
+    """Rebuild the genres and book_genres rows for the given books"""
+    names = sorted({name for genres in genres_by_slug.values() for name in genres})
+
+    # Create any genres we haven't seen before, then look up every id
+    if names:
+        insert_missing(Genre, [{'name': name} for name in names], index_elements=['name'])
+    genre_ids = dict(db.session.execute(
+        select(Genre.name, Genre.id).where(Genre.name.in_(names))
+    ).all())
+
+    # Replace the books' genre links
+    book_ids = dict(db.session.execute(
+        select(Book.slug, Book.id).where(Book.slug.in_(list(genres_by_slug)))
+    ).all())
+    db.session.execute(
+        delete(BookGenre).where(BookGenre.book_id.in_(list(book_ids.values())))
+    )
+    links = [
+        {'book_id': book_ids[slug], 'genre_id': genre_ids[name]}
+        for slug, genres in genres_by_slug.items() if slug in book_ids
+        for name in set(genres)
+    ]
+    if links:
+        db.session.execute(insert(BookGenre), links)
 
 
 def seed_books():
@@ -82,8 +66,8 @@ def seed_books():
 
     # Load seed data
     print(f"Loading seed data from: {seed_file}")
-    with open(seed_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with open(seed_file, 'rb') as f:
+        data = orjson.loads(f.read())
 
     books_data = data.get('books', [])
     print(f"Found {len(books_data)} books in seed file")
@@ -95,22 +79,23 @@ def seed_books():
         # Create tables if they don't exist
         db.create_all()
 
-        added = 0
-        updated = 0
+        epub_slugs = list_epub_slugs(books_dir)
+
+        rows = []
+        genres_by_slug = {}
+        report = []
 
         for book_data in books_data:
-            book_id = book_data['id']
-            slug = BOOK_SLUG_MAP.get(book_id)
+            slug = book_data.get('slug')
 
             if not slug:
-                print(f"  WARNING: No slug mapping for book ID {book_id}: {book_data['title']}")
+                report.append(
+                    f"  WARNING: No slug for book ID {book_data['id']}: {book_data['title']}"
+                )
                 continue
 
-            # Check for existing book
-            existing = Book.query.filter_by(slug=slug).first()
-
             # Get file path
-            file_path = get_epub_path(slug, books_dir)
+            file_path = f'books/{slug}.epub' if slug in epub_slugs else None
 
             book_attrs = {
                 'slug': slug,
@@ -123,24 +108,31 @@ def seed_books():
                 'license': book_data.get('license', 'Public Domain'),
                 'file_path': file_path,
                 'file_format': 'epub' if file_path else None,
-                'genres': BOOK_GENRES.get(slug, ['Classic', 'Fiction']),
+                'genres': book_data.get('genres', ['Classic', 'Fiction']),
             }
 
-            if existing:
-                # Update existing book
-                for key, value in book_attrs.items():
-                    setattr(existing, key, value)
-                updated += 1
-                print(f"  Updated: {book_data['title']} ({slug})")
-            else:
-                # Create new book
-                book = Book(**book_attrs)
-                db.session.add(book)
-                added += 1
-                print(f"  Added: {book_data['title']} ({slug})")
+            genres_by_slug[slug] = book_attrs['genres']
+            rows.append(book_attrs)
+            report.append(f"  Seeded: {book_data['title']} ({slug})")
 
-        db.session.commit()
-        print(f"\nSeeding complete: {added} added, {updated} updated")
+        # One transaction for books and genres, committed when the block exits
+        with db.session.no_autoflush, db.session.begin():
+            # Insert new books and refresh existing ones (matched on slug) in one statement
+            if rows:
+                update_columns = [name for name in rows[0] if name != 'slug']
+                upsert_many(Book, rows, index_elements=['slug'],
+                            update_columns=[*update_columns, 'updated_at'])
+
+            sync_book_genres(genres_by_slug)
+
+        # Book data changed; drop cached catalog lookups and listing pages. Running
+        # servers only see this through a shared cache (CACHE_REDIS_URL); their
+        # in-process caches expire on their own within CACHE_LOCAL_TIMEOUT
+        cache.delete_many(AUTHORS_CACHE_KEY, GENRES_CACHE_KEY, CATALOG_VERSION_KEY)
+
+        # One write for the whole report instead of a print per book
+        report.append(f"\nSeeding complete: {len(rows)} books upserted")
+        print('\n'.join(report))
 
 
 def create_test_user():
@@ -151,8 +143,8 @@ def create_test_user():
 
     with app.app_context():
         # Check if test user exists
-        existing = User.query.filter_by(email='test@example.com').first()
-        if existing:
+        existing = db.session.scalar(select(User.id).where(User.email == 'test@example.com'))
+        if existing is not None:
             print("Test user already exists")
             return
 